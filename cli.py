@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import create_and_upload_embeddings
+import ingest_coordinator
+import retrive_and_generate_report
+import retrive_and_generate_report_NN
+
+# None of the modules above import torch, colpali_engine, pdf2image or pyvespa
+# at module level; each is imported inside the function that uses it and the
+# model is loaded on first use. `--help` therefore loads none of them, and
+# `schema`, `deploy` and `feed` only load pyvespa.
+
+
+def vespa_app_module(args):
+    if args.nn:
+        import create_vespa_app_NN
+        return create_vespa_app_NN
+    import create_vespa_app
+    return create_vespa_app
+
+
+def run_schema(args):
+    app_directory = vespa_app_module(args).create_and_save_vespa_schema()
+    print(f"Vespa application package saved to: {app_directory}")
+
+
+def run_deploy(args):
+    vespa_app = vespa_app_module(args)
+    # Step 1: Create and save Vespa schema
+    app_directory = vespa_app.create_and_save_vespa_schema()
+    # Step 2: Deploy the Vespa application to the local container
+    vespa_app.deploy_vespa_application(app_directory)
+
+
+def run_feed(args):
+    errors = asyncio.run(create_and_upload_embeddings.feed_exported_files(args.files))
+    if errors:
+        print(f"{errors} pages failed to feed")
+        raise SystemExit(1)
+
+
+def run_query(args):
+    if args.nn:
+        retrive_and_generate_report_NN.run(args)
+    else:
+        retrive_and_generate_report.run(args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="PDF retrieval with ColQwen2 and Vespa.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    schema = subparsers.add_parser("schema", help="Generate the Vespa application package")
+    schema.add_argument("--nn", action="store_true", help="Use the nearest neighbor retrieval ranking profile")
+    schema.set_defaults(func=run_schema)
+
+    deploy = subparsers.add_parser("deploy", help="Generate and deploy the Vespa application package")
+    deploy.add_argument("--nn", action="store_true", help="Use the nearest neighbor retrieval ranking profile")
+    deploy.set_defaults(func=run_deploy)
+
+    ingest = subparsers.add_parser("ingest", help="Embed the PDFs of one shard and feed or export them")
+    create_and_upload_embeddings.add_arguments(ingest)
+    ingest.set_defaults(func=create_and_upload_embeddings.run)
+
+    coordinate = subparsers.add_parser("coordinate", help="Run sharded ingestion workers and merge their manifests",
+                                       description=ingest_coordinator.DESCRIPTION)
+    ingest_coordinator.add_arguments(coordinate)
+    coordinate.set_defaults(func=ingest_coordinator.run)
+
+    feed = subparsers.add_parser("feed", help="Feed JSON-lines files written by `ingest --export-dir` to Vespa")
+    feed.add_argument("files", nargs="+", help="JSON-lines feed files")
+    feed.set_defaults(func=run_feed)
+
+    query = subparsers.add_parser("query", help="Run the queries and save the results as HTML reports")
+    query.add_argument("--nn", action="store_true", help="Use nearest neighbor retrieval instead of BM25")
+    retrive_and_generate_report.add_arguments(query)
+    query.set_defaults(func=run_query)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
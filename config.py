@@ -14,6 +14,8 @@ class Settings(BaseSettings):
     vespa_port: int = Field(default=8080)  # Vespa port
     model_name: str = Field(default="impactframes/colqwen2-v0.1")  # Model name
     batch_size: int = Field(default=1)  # Batch size for DataLoader
+    num_shards: int = Field(default=1)  # Number of ingest shards
+    manifest_dir: str = Field(default="manifests")  # Per-shard ingest manifests
 
     model_config = SettingsConfigDict(
         env_prefix="MYAPP_",         # Prefix for env variables
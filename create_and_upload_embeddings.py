@@ -1,41 +1,30 @@
-import torch
-import requests
-import numpy as np
-from pdf2image import convert_from_path
-from pypdf import PdfReader
-import base64
-from torch.utils.data import DataLoader
-from tqdm import tqdm
-from io import BytesIO
-from colpali_engine.models import ColQwen2, ColQwen2Processor
-from vespa.application import Vespa
-from vespa.io import VespaResponse
+import argparse
 import asyncio
+import base64
 import json
-from config import Settings  
+import os
+import tempfile
+from io import BytesIO
+from tqdm import tqdm
+from config import Settings
+from model import embed_images
+from sharding import ShardManifest, new_run_id, select_shard, page_id, parse_index_list
 settings = Settings()
-# Initialize the model and processor using settings
-model_name = settings.model_name  # Get model name from settings
-# Automatically set device_map to "cuda" if GPU is available, otherwise "cpu"
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(device)
-# Load the model with the appropriate device and dtype
-model = ColQwen2.from_pretrained(
-    model_name,
-    torch_dtype=torch.bfloat16,
-    device_map=device  # Automatically select GPU if available
-)
-processor = ColQwen2Processor.from_pretrained(model_name)
-model = model.eval()
+
+# Pin this worker to a set of cores so several replicas can share a host
+def set_core_affinity(cpus):
+    if not hasattr(os, "sched_setaffinity"):
+        print("Core affinity is not supported on this platform, ignoring --cpus")
+        return
+    import torch
+    os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(len(cpus))
+    print(f"Pinned to cores {sorted(cpus)}")
 
 def load_pdfs_from_json(json_file_path):
     with open(json_file_path, 'r') as f:
         return json.load(f)
 
-# Path to the JSON file containing PDF details
-json_file_path = 'pdfs.json'
-sample_pdfs = load_pdfs_from_json(json_file_path)
-
 # Helper function to resize images using settings
 def resize_image(image, max_height=settings.image_resize):  # Use image resize from settings
     width, height = image.size
@@ -46,56 +35,46 @@ def resize_image(image, max_height=settings.image_resize):  # Use image resize f
         return image.resize((new_width, new_height))
     return image
 
+class PdfError(Exception):
+    """A PDF that can't be downloaded or read; ingest_shard skips it."""
+
 # Download PDF
 def download_pdf(url):
-    response = requests.get(url)
+    import requests
+    try:
+        response = requests.get(url)
+    except requests.RequestException as e:
+        raise PdfError(f"Failed to download PDF: {e}") from e
     if response.status_code == 200:
         return BytesIO(response.content)
     else:
-        raise Exception(f"Failed to download PDF: Status code {response.status_code}")
+        raise PdfError(f"Failed to download PDF: Status code {response.status_code}")
 
 # Convert PDF to images and extract text
 def get_pdf_images(pdf_url):
+    from pdf2image import convert_from_path
+    from pdf2image.exceptions import PDFPageCountError, PDFSyntaxError
+    from pypdf import PdfReader
+    from pypdf.errors import PdfReadError
     pdf_file = download_pdf(pdf_url)
-    temp_file = "temp.pdf"
-    with open(temp_file, "wb") as f:
-        f.write(pdf_file.read())
-    reader = PdfReader(temp_file)
-    page_texts = []
-    for page_number in range(len(reader.pages)):
-        page = reader.pages[page_number]
-        text = page.extract_text()
-        page_texts.append(text)
-    images = convert_from_path(temp_file)
-    assert len(images) == len(page_texts)
+    # Per-call temp file so workers sharing a directory don't clobber each other
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as temp_file:
+        temp_file.write(pdf_file.read())
+        temp_file.flush()
+        try:
+            reader = PdfReader(temp_file.name)
+            page_texts = []
+            for page_number in range(len(reader.pages)):
+                page = reader.pages[page_number]
+                text = page.extract_text()
+                page_texts.append(text)
+            images = convert_from_path(temp_file.name)
+        except (PdfReadError, PDFPageCountError, PDFSyntaxError) as e:
+            raise PdfError(f"Failed to read PDF: {e}") from e
+    if len(images) != len(page_texts):
+        raise PdfError(f"Page count mismatch: {len(images)} images, {len(page_texts)} texts")
     return (images, page_texts)
 
-# Process each PDF and extract images and texts
-for pdf in sample_pdfs:
-    page_images, page_texts = get_pdf_images(pdf['url'])
-    pdf['images'] = page_images
-    pdf['texts'] = page_texts
-
-# Create embeddings for images in each PDF
-for pdf in sample_pdfs:
-    page_embeddings = []
-    dataloader = DataLoader(
-        pdf['images'],
-        batch_size=settings.batch_size,  
-        shuffle=False,
-        collate_fn=lambda x: processor.process_images(x),
-    )
-    print(f"Created DataLoader for {len(pdf['images'])} images.")
-
-    for batch_doc in tqdm(dataloader):
-        with torch.no_grad():
-            batch_doc = {k: v.to(model.device) for k, v in batch_doc.items()}
-            embeddings_doc = model(**batch_doc)
-            page_embeddings.extend(list(torch.unbind(embeddings_doc.to("cpu"))))
-            print(f"Current page embeddings: {len(page_embeddings)} pages embedded.")
-    
-    pdf['embeddings'] = page_embeddings
-
 # Convert image to base64
 def get_base64_image(image):
     buffered = BytesIO()
@@ -103,18 +82,19 @@ def get_base64_image(image):
     return str(base64.b64encode(buffered.getvalue()), "utf-8")
 
 # Prepare data for Vespa
-vespa_feed = []
-for pdf in sample_pdfs:
+def build_vespa_feed(pdf, page_texts, page_embeddings, page_images):
+    import numpy as np
+    vespa_feed = []
     url = pdf['url']
     title = pdf['title']
-    for page_number, (page_text, embedding, image) in enumerate(zip(pdf['texts'], pdf['embeddings'], pdf['images'])):
+    for page_number, (page_text, embedding, image) in enumerate(zip(page_texts, page_embeddings, page_images)):
         base_64_image = get_base64_image(resize_image(image, settings.image_resize))  # Use dynamic image resize
         embedding_dict = dict()
         for idx, patch_embedding in enumerate(embedding):
             binary_vector = np.packbits(np.where(patch_embedding > 0, 1, 0)).astype(np.int8).tobytes().hex()
-            embedding_dict[idx] = binary_vector      
+            embedding_dict[idx] = binary_vector
         page = {
-            "id": hash(url + str(page_number)),
+            "id": page_id(url, page_number),
             "url": url,
             "title": title,
             "page_number": page_number,
@@ -123,20 +103,107 @@ for pdf in sample_pdfs:
             "embedding": embedding_dict
         }
         vespa_feed.append(page)
+    return vespa_feed
+
+
+def open_vespa_session():
+    from vespa.application import Vespa
+    vespa_client = Vespa(url=settings.vespa_url)
+    return vespa_client.asyncio(connections=1, total_timeout=180)
+
+# Pages are counted in the manifest as they are fed, so a feed that dies
+# part-way through a PDF still reports the pages already sent
+async def feed_vespa_pages(session, vespa_feed, manifest=None):
+    errors = 0
+    for page in tqdm(vespa_feed):
+        response = await session.feed_data_point(
+            data_id=page['id'], fields=page, schema=settings.vespa_app_name
+        )
+        successful = response.is_successful()
+        if not successful:
+            errors += 1
+            print(response.json())
+        if manifest is not None:
+            manifest.record_feed(int(successful), int(not successful))
+    return errors
+
+def export_path(export_dir, shard_index, num_shards):
+    return os.path.join(export_dir, f"feed-{shard_index:04d}-of-{num_shards:04d}.jsonl")
+
+# Append prepared pages to a JSON-lines file that feed_exported_files can feed later
+def export_vespa_pages(path, vespa_feed):
+    with open(path, "a", encoding="utf-8") as f:
+        for page in vespa_feed:
+            f.write(json.dumps(page) + "\n")
+
+# Run the full pipeline for the PDFs of one shard, one PDF at a time
+async def ingest_shard(pdfs, manifest, session=None, export_file=None):
+    for pdf in pdfs:
+        # A bad PDF is recorded in the manifest and skipped; anything else
+        # (missing dependencies, embedding or Vespa errors) fails the shard
+        try:
+            page_images, page_texts = get_pdf_images(pdf['url'])
+        except PdfError as e:
+            print(f"Skipping {pdf['url']}: {e}")
+            manifest.record_failure(pdf, e)
+            continue
+        page_embeddings = embed_images(page_images)
+        vespa_feed = build_vespa_feed(pdf, page_texts, page_embeddings, page_images)
+        if export_file:
+            export_vespa_pages(export_file, vespa_feed)
+        else:
+            await feed_vespa_pages(session, vespa_feed, manifest)
+        manifest.record_pdf(pdf, len(vespa_feed))
+
+# Feed pages previously written with --export-dir, without loading the model
+async def feed_exported_files(paths):
+    errors = 0
+    async with open_vespa_session() as session:
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                vespa_feed = [json.loads(line) for line in f if line.strip()]
+            print(f"Feeding {len(vespa_feed)} pages from {path}")
+            errors += await feed_vespa_pages(session, vespa_feed)
+    return errors
+
+def add_arguments(parser):
+    parser.add_argument("--pdfs", default="pdfs.json", help="JSON file containing PDF details")
+    parser.add_argument("--num-shards", type=int, default=settings.num_shards, help="Total number of shards")
+    parser.add_argument("--shard-index", type=int, default=0, help="Shard processed by this worker")
+    parser.add_argument("--cpus", help="Cores to pin this worker to, e.g. '0-7' or '0,2,4'")
+    parser.add_argument("--manifest-dir", default=settings.manifest_dir, help="Directory for per-shard manifests")
+    parser.add_argument("--run-id", help="Run this shard belongs to (default: a new run id)")
+    parser.add_argument("--export-dir", help="Write the prepared pages to JSON-lines files here instead of feeding Vespa")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Embed PDFs with ColQwen2 and feed them to Vespa.")
+    add_arguments(parser)
+    return parser.parse_args()
 
-async def feed_vespa_pages(vespa_client, vespa_feed):
-    async with vespa_client.asyncio(connections=1, total_timeout=180) as session:
-        for page in tqdm(vespa_feed):
-            response: VespaResponse = await session.feed_data_point(
-                data_id=page['id'], fields=page, schema=settings.vespa_app_name
-            )
-            if not response.is_successful():
-                print(response.json())
+async def main(args):
+    if args.cpus:
+        set_core_affinity(parse_index_list(args.cpus))
+    sample_pdfs = load_pdfs_from_json(args.pdfs)
+    pdfs = select_shard(sample_pdfs, args.shard_index, args.num_shards)
+    print(f"Shard {args.shard_index}/{args.num_shards}: {len(pdfs)} of {len(sample_pdfs)} PDFs")
+    manifest = ShardManifest(args.manifest_dir, args.run_id or new_run_id(), args.shard_index, args.num_shards, pdfs)
+    try:
+        if args.export_dir:
+            os.makedirs(args.export_dir, exist_ok=True)
+            export_file = export_path(args.export_dir, args.shard_index, args.num_shards)
+            # Start from an empty file so a re-run doesn't duplicate pages
+            open(export_file, "w").close()
+            await ingest_shard(pdfs, manifest, export_file=export_file)
+        else:
+            async with open_vespa_session() as session:
+                await ingest_shard(pdfs, manifest, session=session)
+    except BaseException:
+        manifest.finish("failed")
+        raise
+    manifest.finish()
 
-async def main():
-    vespa_client = Vespa(url=settings.vespa_url) 
-    await feed_vespa_pages(vespa_client, vespa_feed)
+def run(args):
+    asyncio.run(main(args))
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run(parse_args())
@@ -1,8 +1,5 @@
 import os
 import subprocess
-from vespa.package import Schema, Document, Field, FieldSet, HNSW
-from vespa.package import ApplicationPackage
-from vespa.package import RankProfile, Function, FirstPhaseRanking, SecondPhaseRanking
 from config import Settings  
 from datetime import datetime, timedelta
 
@@ -12,6 +9,10 @@ from datetime import datetime, timedelta
 settings = Settings()
 
 def create_and_save_vespa_schema():
+    from vespa.package import Schema, Document, Field, FieldSet, HNSW
+    from vespa.package import ApplicationPackage
+    from vespa.package import RankProfile, Function, FirstPhaseRanking, SecondPhaseRanking
+
     # Define Vespa schema and ranking profiles
     colpali_schema = Schema(
         name=settings.vespa_app_name,  # Use vespa app name from settings
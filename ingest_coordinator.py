@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from config import Settings
+from sharding import (
+    HEARTBEAT_INTERVAL, load_manifests, merge_manifests, new_run_id, parse_index_list, format_index_list, partition_cpus
+)
+
+settings = Settings()
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "create_and_upload_embeddings.py")
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return os.sched_getaffinity(0)
+    return set(range(os.cpu_count() or 1))
+
+
+# Start one worker process per local shard, each pinned to its own group of
+# cores and, when GPUs are given, to one of them (round-robin)
+def launch_workers(run_id, shards, num_shards, cpus, pdfs_file, manifest_dir, export_dir=None, gpus=None):
+    cpu_groups = partition_cpus(cpus, len(shards))
+    workers = []
+    for i, (shard_index, cpu_group) in enumerate(zip(shards, cpu_groups)):
+        command = [
+            sys.executable, WORKER_SCRIPT,
+            "--pdfs", pdfs_file,
+            "--num-shards", str(num_shards),
+            "--shard-index", str(shard_index),
+            "--cpus", format_index_list(cpu_group),
+            "--manifest-dir", manifest_dir,
+            "--run-id", run_id,
+        ]
+        if export_dir:
+            command += ["--export-dir", export_dir]
+        env = dict(os.environ)
+        device = f"cores {format_index_list(cpu_group)}"
+        if gpus:
+            env["CUDA_VISIBLE_DEVICES"] = str(gpus[i % len(gpus)])
+            device += f", GPU {env['CUDA_VISIBLE_DEVICES']}"
+        print(f"Starting shard {shard_index} on {device}")
+        workers.append((shard_index, subprocess.Popen(command, env=env)))
+    return workers
+
+
+def merge_run(args, run_id):
+    manifests = load_manifests(args.manifest_dir, run_id, args.num_shards)
+    return merge_manifests(manifests, run_id, args.num_shards, args.stale_after)
+
+
+def print_progress(summary):
+    print(
+        f"[{summary['shards_done']}/{summary['num_shards']} shards done, "
+        f"{summary['shards_reporting']} reporting from {len(summary['hosts'])} host(s)] "
+        f"PDFs {summary['pdfs_done']}/{summary['pdfs_total']} ({len(summary['pdfs_failed'])} failed), "
+        f"pages {summary['pages_done']} ({summary['pages_fed']} fed, {summary['feed_errors']} errors), "
+        f"{summary['pages_per_second']} pages/s over {summary['elapsed_seconds']}s"
+    )
+
+
+def write_summary(summary, manifest_dir):
+    summary_path = os.path.join(manifest_dir, "manifest.json")
+    tmp_path = f"{summary_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp_path, summary_path)
+    print(f"Merged manifest saved to: {os.path.abspath(summary_path)}")
+
+
+DESCRIPTION = (
+    "Run sharded ingestion workers and merge their manifests. "
+    "For multiple hosts, run this on each host with the same --num-shards, "
+    "a disjoint --shards range, a shared --manifest-dir and the same --run-id."
+)
+
+
+def add_arguments(parser):
+    parser.add_argument("--pdfs", default="pdfs.json", help="JSON file containing PDF details")
+    parser.add_argument("--num-shards", type=int, default=settings.num_shards, help="Total number of shards across all hosts")
+    parser.add_argument("--shards", help="Shards to run on this host, e.g. '0-3' (default: all)")
+    parser.add_argument("--cpus", help="Cores available to the local workers (default: all usable cores)")
+    parser.add_argument("--manifest-dir", default=settings.manifest_dir, help="Directory for per-shard manifests")
+    parser.add_argument("--gpus", help="GPUs to spread the local workers over, e.g. '0-3' "
+                                       "(default: all workers use the default device)")
+    parser.add_argument("--run-id", help="Run id shared by all hosts of one run (default: a new run id; required with --merge-only)")
+    parser.add_argument("--export-dir", help="Have workers write JSON-lines feed files here instead of feeding Vespa")
+    parser.add_argument("--poll-interval", type=float, default=10.0, help="Seconds between progress reports")
+    parser.add_argument("--stale-after", type=float, default=10 * HEARTBEAT_INTERVAL,
+                        help="Treat a running shard as dead once its manifest hasn't been updated for this many seconds")
+    parser.add_argument("--timeout", type=float,
+                        help="With --merge-only, give up after this many seconds if shards are still missing or running")
+    parser.add_argument("--allow-failed-pdfs", action="store_true",
+                        help="Exit successfully even if some PDFs were skipped as unreadable")
+    parser.add_argument("--merge-only", action="store_true",
+                        help="Don't start workers; wait for all shards to finish and merge their manifests")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    add_arguments(parser)
+    return parser.parse_args()
+
+
+def run(args):
+    if args.merge_only and not args.run_id:
+        sys.exit("--merge-only needs the --run-id of the run to merge")
+    shards = sorted(parse_index_list(args.shards)) if args.shards else list(range(args.num_shards))
+    if not shards or shards[-1] >= args.num_shards:
+        sys.exit(f"--shards must select shards in [0, {args.num_shards}), got {args.shards!r}")
+    os.makedirs(args.manifest_dir, exist_ok=True)
+    run_id = args.run_id or new_run_id()
+    print(f"Run id: {run_id}")
+
+    workers = []
+    if not args.merge_only:
+        cpus = parse_index_list(args.cpus) if args.cpus else available_cpus()
+        gpus = sorted(parse_index_list(args.gpus)) if args.gpus else None
+        workers = launch_workers(run_id, shards, args.num_shards, cpus, args.pdfs, args.manifest_dir,
+                                 args.export_dir, gpus)
+
+    # Local mode stops once its own workers exit; merge-only waits for every shard
+    # to finish, fail or go stale, or for --timeout
+    started = time.time()
+    while True:
+        summary = merge_run(args, run_id)
+        print_progress(summary)
+        if workers:
+            if all(process.poll() is not None for _, process in workers):
+                break
+        elif summary["complete"]:
+            break
+        elif args.timeout is not None and time.time() - started > args.timeout:
+            print(f"Timed out after {args.timeout}s")
+            break
+        time.sleep(args.poll_interval)
+
+    summary = merge_run(args, run_id)
+    print_progress(summary)
+    # A host running only some of the shards would write a partial summary over
+    # the shared manifest.json; leave that to --merge-only
+    if args.merge_only or len(shards) == args.num_shards:
+        write_summary(summary, args.manifest_dir)
+    else:
+        print(f"Run --merge-only --run-id {run_id} to merge the manifests of all shards")
+
+    for pdf in summary["pdfs_failed"]:
+        print(f"Failed PDF: {pdf['url']} ({pdf['error']})")
+
+    failed = [shard_index for shard_index, process in workers if process.returncode != 0]
+    if failed:
+        print(f"Shards failed on this host: {failed}")
+        sys.exit(1)
+    if args.merge_only and not (summary["complete"] and summary["shards_done"] == args.num_shards):
+        print(f"Shards failed: {summary['shards_failed']}, stale: {summary['shards_stale']}, "
+              f"missing: {summary['shards_missing']}")
+        sys.exit(1)
+    if summary["pdfs_failed"] and not args.allow_failed_pdfs:
+        print(f"{len(summary['pdfs_failed'])} PDFs failed; pass --allow-failed-pdfs to accept a partial ingest")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run(parse_args())
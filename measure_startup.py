@@ -0,0 +1,106 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CLI = os.path.join(ROOT, "cli.py")
+SUBCOMMANDS = ["schema", "deploy", "ingest", "coordinate", "feed", "query"]
+HEAVY_MODULES = ["torch", "colpali_engine", "pdf2image", "pypdf", "vespa"]
+MODEL_MODULES = ["torch", "colpali_engine", "pdf2image"]
+ROOT_PATH = f"sys.path.insert(0, {ROOT!r}); "
+
+# Code paths run in a fresh interpreter, with the modules each must not load:
+# --help loads none of the heavy dependencies, schema/deploy and feed may load
+# pyvespa but never the model stack.
+HEAVY_CHECKS = [
+    ("--help", "import cli; cli.build_parser()", HEAVY_MODULES),
+    ("schema", "import cli; cli.main(['schema'])", MODEL_MODULES),
+    ("feed", "import cli; from create_and_upload_embeddings import feed_exported_files, open_vespa_session; "
+             "open_vespa_session()", MODEL_MODULES),
+]
+
+# Subcommands that talk to a running Vespa or load the model can't be run
+# here, so time the CLI import plus the dependencies they import lazily.
+LAZY_IMPORTS = {
+    "deploy": "import cli, create_vespa_app; import vespa.package",
+    "feed": "import cli; import vespa.application",
+    "ingest": "import cli; import torch, pdf2image, pypdf, vespa.application; import colpali_engine.models",
+    "query": "import cli; import torch, vespa.application; import colpali_engine.models",
+}
+
+
+# Time `repeat` cold starts of a command, each in a new interpreter
+def time_command(command, repeat, cwd=None):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            error = result.stderr.decode('utf-8').strip().splitlines()
+            raise RuntimeError(error[-1] if error else f"exit code {result.returncode}")
+    return timings
+
+
+def report(label, command, repeat, cwd=None):
+    try:
+        timings = time_command(command, repeat, cwd)
+    except RuntimeError as e:
+        print(f"{label:<32} {'unavailable':>8}  ({e})")
+        return
+    print(f"{label:<32} {min(timings):>8.3f} {statistics.median(timings):>11.3f}")
+
+
+# Run `code` in a fresh interpreter (in a temporary directory, so `schema`
+# doesn't write into the repo) and return which of `forbidden` it imported
+def check_modules(code, forbidden):
+    script = (f"import sys; {ROOT_PATH}{code}; "
+              f"print('LOADED:' + ','.join(m for m in {forbidden!r} if m in sys.modules))")
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run([sys.executable, "-c", script], cwd=cwd,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        error = result.stderr.decode('utf-8').strip().splitlines()
+        print(f"Skipped heavy-module check ({error[-1] if error else result.returncode})")
+        return None
+    loaded = result.stdout.decode('utf-8').rsplit("LOADED:", 1)[-1].strip()
+    return [m for m in loaded.split(",") if m]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure the cold-start time of each CLI subcommand.")
+    parser.add_argument("--repeat", type=int, default=5, help="Cold starts per subcommand")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"{'command':<32} {'min (s)':>8} {'median (s)':>11}")
+
+    report("--help", [sys.executable, CLI, "--help"], args.repeat)
+    for name in SUBCOMMANDS:
+        report(f"{name} --help", [sys.executable, CLI, name, "--help"], args.repeat)
+
+    # schema only writes the application package, so run it for real
+    with tempfile.TemporaryDirectory() as app_dir:
+        report("schema", [sys.executable, CLI, "schema"], args.repeat, cwd=app_dir)
+    for name, imports in LAZY_IMPORTS.items():
+        report(f"{name} (CLI + lazy imports)", [sys.executable, "-c", imports], args.repeat, cwd=ROOT)
+
+    regressions = False
+    for label, code, forbidden in HEAVY_CHECKS:
+        loaded = check_modules(code, forbidden)
+        if loaded is None:
+            continue
+        print(f"Heavy modules loaded by {label}: {', '.join(loaded) or 'none'}")
+        regressions = regressions or bool(loaded)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+from functools import lru_cache
+from config import Settings
+
+settings = Settings()
+
+
+# Load the model and processor on first use and reuse them afterwards
+@lru_cache(maxsize=None)
+def get_model():
+    import torch
+    from colpali_engine.models import ColQwen2, ColQwen2Processor
+
+    # Automatically set device_map to "cuda" if GPU is available, otherwise "cpu"
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(device)
+    # Load the model with the appropriate device and dtype
+    model = ColQwen2.from_pretrained(
+        settings.model_name,  # Get model name from settings
+        torch_dtype=torch.bfloat16,
+        device_map=device  # Automatically select GPU if available
+    )
+    processor = ColQwen2Processor.from_pretrained(settings.model_name)
+    return model.eval(), processor
+
+
+def _embed(items, collate_fn):
+    import torch
+    from torch.utils.data import DataLoader
+    from tqdm import tqdm
+
+    model, _ = get_model()
+    dataloader = DataLoader(
+        items,
+        batch_size=settings.batch_size,  # Use batch size from settings
+        shuffle=False,
+        collate_fn=collate_fn,
+    )
+    embeddings = []
+    for batch in tqdm(dataloader):
+        with torch.no_grad():  # Disable gradient calculation
+            batch = {k: v.to(model.device) for k, v in batch.items()}  # Move data to model's device
+            batch_embeddings = model(**batch)
+            embeddings.extend(list(torch.unbind(batch_embeddings.to("cpu"))))  # Store embeddings on the CPU
+    return embeddings
+
+
+# Create embeddings for a list of page images
+def embed_images(images):
+    _, processor = get_model()
+    print(f"Created DataLoader for {len(images)} images.")
+    return _embed(images, lambda x: processor.process_images(x))
+
+
+# Create embeddings for a list of query strings
+def embed_queries(queries):
+    _, processor = get_model()
+    return _embed(queries, lambda x: processor.process_queries(x))
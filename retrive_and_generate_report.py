@@ -1,50 +1,15 @@
+import argparse
 import asyncio
-from torch.utils.data import DataLoader
-import torch
-from vespa.io import VespaQueryResponse
-from colpali_engine.models import ColQwen2, ColQwen2Processor
-from vespa.application import Vespa
 import webbrowser
 import os
 from config import Settings  # Import settings
+from model import embed_queries
 import json
 settings = Settings()
-print(str(settings.vespa_url))
-with open("queries.json", "r") as f:
-    queries = json.load(f)["queries"]
 
-for query in queries:
-    print(query)
-
-device = "cuda" if torch.cuda.is_available() else "cpu"
-
-# Initialize the model and processor using settings
-model_name = settings.model_name  # Get model name from settings
-print(torch.cuda.is_available())  # Check if CUDA is available
-model = ColQwen2.from_pretrained(
-    model_name,
-    torch_dtype=torch.bfloat16,
-    device_map=device  # Automatically select GPU if available
-)
-processor = ColQwen2Processor.from_pretrained(model_name)
-model = model.eval()  # Set model to evaluation mode
-
-
-# Create a DataLoader to process the queries
-dataloader = DataLoader(
-    queries,
-    batch_size=settings.batch_size,  # Use batch size from settings
-    shuffle=False,
-    collate_fn=lambda x: processor.process_queries(x),
-)
-
-# Generate embeddings for each query using the model
-qs = []
-for batch_query in dataloader:
-    with torch.no_grad():  # Disable gradient calculation
-        batch_query = {k: v.to(model.device) for k, v in batch_query.items()}  # Move data to model's device
-        embeddings_query = model(**batch_query)  # Get query embeddings
-        qs.extend(list(torch.unbind(embeddings_query.to("cpu"))))  # Store embeddings on the CPU
+def load_queries(json_file_path="queries.json"):
+    with open(json_file_path, "r") as f:
+        return json.load(f)["queries"]
 
 # Function to save query results as an HTML file and display it
 def save_query_results_as_html(query, response, hits=5, file_name="results.html"):
@@ -81,10 +46,11 @@ def save_query_results_as_html(query, response, hits=5, file_name="results.html"
     
     print(f"Results saved to: {abs_file_path}")
 
-# Initialize Vespa application with local instance
-app = Vespa(url=settings.vespa_url)  # Use dynamic URL and port from settings
 # Define an asynchronous function to execute queries
-async def main():
+async def run_queries(queries, qs):
+    from vespa.application import Vespa
+    # Initialize Vespa application with local instance
+    app = Vespa(url=settings.vespa_url)  # Use dynamic URL and port from settings
     # Open a session with Vespa using asyncio
     async with app.asyncio(connections=1, total_timeout=120) as session:
         for idx, query in enumerate(queries):
@@ -92,7 +58,7 @@ async def main():
             query_embedding = {k: v.tolist() for k, v in enumerate(qs[idx])}
             
             # Execute the Vespa query with embeddings and additional parameters
-            response: VespaQueryResponse = await session.query(
+            response = await session.query(
                 yql= f"select title,url,image,page_number from {settings.vespa_app_name} where userInput(@userQuery)",  # YQL query
                 ranking=settings.ranking_profile_name,  # Use ranking profile from settings
                 userQuery=query,
@@ -110,6 +76,26 @@ async def main():
             # Save and display the query results in HTML format
             save_query_results_as_html(query, response, file_name=f"results_{idx}.html")
 
+def add_arguments(parser):
+    parser.add_argument("--queries", default="queries.json", help="JSON file containing the queries")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query Vespa with BM25 retrieval and MaxSim re-ranking.")
+    add_arguments(parser)
+    return parser.parse_args()
+
+async def main(args):
+    print(str(settings.vespa_url))
+    queries = load_queries(args.queries)
+    for query in queries:
+        print(query)
+    # Generate embeddings for each query using the model
+    qs = embed_queries(queries)
+    await run_queries(queries, qs)
+
+def run(args):
+    asyncio.run(main(args))
+
 # Entry point for the script
 if __name__ == "__main__":
-    asyncio.run(main())  # Run the main asynchronous function
+    run(parse_args())
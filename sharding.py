@@ -0,0 +1,229 @@
+import glob
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+
+# Deterministic shard assignment: Python's built-in hash() is salted per
+# process, so workers on different processes/hosts would disagree on it.
+def shard_for_url(url, num_shards):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return int(digest, 16) % num_shards
+
+
+def select_shard(pdfs, shard_index, num_shards):
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"shard_index must be in [0, {num_shards}), got {shard_index}")
+    return [pdf for pdf in pdfs if shard_for_url(pdf['url'], num_shards) == shard_index]
+
+
+# Stable Vespa document id for a page, identical across workers and re-runs
+def page_id(url, page_number):
+    return hashlib.sha1(f"{url}#{page_number}".encode("utf-8")).hexdigest()
+
+
+# Parse a list such as "0-3,8,10-11" (cores or shards) into a set of ids
+def parse_index_list(index_list):
+    indices = set()
+    for part in index_list.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            indices.update(range(int(start), int(end) + 1))
+        else:
+            indices.add(int(part))
+    return indices
+
+
+def format_index_list(indices):
+    return ",".join(str(index) for index in sorted(indices))
+
+
+# Group cores by CPU socket, falling back to a single group when the topology
+# isn't available (non-Linux, containers without /sys)
+def cpu_sockets(cpus):
+    sockets = {}
+    for cpu in sorted(cpus):
+        path = f"/sys/devices/system/cpu/cpu{cpu}/topology/physical_package_id"
+        try:
+            with open(path, "r") as f:
+                socket_id = int(f.read().strip())
+        except (OSError, ValueError):
+            return [sorted(cpus)]
+        sockets.setdefault(socket_id, []).append(cpu)
+    return [sockets[socket_id] for socket_id in sorted(sockets)]
+
+
+# Split cores into `num_workers` disjoint groups of contiguous ids
+def split_contiguous(cpus, num_workers):
+    cpus = sorted(cpus)
+    if num_workers > len(cpus):
+        # More workers than cores: let them share the full set
+        return [set(cpus) for _ in range(num_workers)]
+    size, extra = divmod(len(cpus), num_workers)
+    groups, start = [], 0
+    for i in range(num_workers):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(set(cpus[start:end]))
+        start = end
+    return groups
+
+
+# Split the available cores into `num_workers` groups that never span two
+# sockets when there are at least as many workers as sockets
+def partition_cpus(cpus, num_workers):
+    sockets = cpu_sockets(cpus)
+    if num_workers <= len(sockets):
+        # Fewer workers than sockets: give each worker whole sockets
+        groups = [set() for _ in range(num_workers)]
+        for i, socket_cpus in enumerate(sockets):
+            groups[i % num_workers].update(socket_cpus)
+        return groups
+    groups = []
+    for i, socket_cpus in enumerate(sockets):
+        socket_workers = num_workers // len(sockets) + (1 if i < num_workers % len(sockets) else 0)
+        groups.extend(split_contiguous(socket_cpus, socket_workers))
+    return groups
+
+
+# Identifies one ingest run so manifests left over from earlier runs are ignored
+def new_run_id():
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def manifest_path(manifest_dir, run_id, shard_index, num_shards):
+    return os.path.join(manifest_dir, f"{run_id}-shard-{shard_index:04d}-of-{num_shards:04d}.json")
+
+
+# How often a running worker refreshes `updated_at`, even while it is busy
+# embedding a single large PDF
+HEARTBEAT_INTERVAL = 30
+
+
+class ShardManifest:
+    """Progress record for one shard, rewritten atomically as the worker advances."""
+
+    def __init__(self, manifest_dir, run_id, shard_index, num_shards, pdfs):
+        self.path = manifest_path(manifest_dir, run_id, shard_index, num_shards)
+        self.data = {
+            "run_id": run_id,
+            "shard_index": shard_index,
+            "num_shards": num_shards,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "status": "running",
+            "started_at": time.time(),
+            "finished_at": None,
+            "updated_at": None,
+            "pdfs_total": len(pdfs),
+            "pdfs_done": 0,
+            "pages_done": 0,
+            "pages_fed": 0,
+            "feed_errors": 0,
+            "pdfs": [],
+            "pdfs_failed": [],
+        }
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        os.makedirs(manifest_dir, exist_ok=True)
+        self.save()
+        threading.Thread(target=self._heartbeat, daemon=True).start()
+
+    def _heartbeat(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            self.save()
+
+    def record_pdf(self, pdf, pages):
+        with self._lock:
+            self.data["pdfs"].append({"title": pdf['title'], "url": pdf['url'], "pages": pages})
+            self.data["pdfs_done"] += 1
+            self.data["pages_done"] += pages
+            self.save()
+
+    def record_failure(self, pdf, error):
+        with self._lock:
+            self.data["pdfs_failed"].append({"title": pdf['title'], "url": pdf['url'], "error": repr(error)})
+            self.save()
+
+    def record_feed(self, fed, errors):
+        with self._lock:
+            self.data["pages_fed"] += fed
+            self.data["feed_errors"] += errors
+            self.save()
+
+    def finish(self, status="done"):
+        self._stopped.set()
+        with self._lock:
+            self.data["status"] = status
+            self.data["finished_at"] = time.time()
+            self.save()
+
+    def save(self):
+        with self._lock:
+            self.data["updated_at"] = time.time()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def load_manifests(manifest_dir, run_id, num_shards):
+    pattern = glob.escape(os.path.join(manifest_dir, f"{run_id}-shard-")) + f"*-of-{num_shards:04d}.json"
+    manifests = []
+    for path in sorted(glob.glob(pattern)):
+        try:
+            with open(path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            # Partially written by a worker on another host; pick it up next poll
+            continue
+        if manifest.get("run_id") == run_id:
+            manifests.append(manifest)
+    return manifests
+
+
+# A running shard whose worker stopped heartbeating (killed, OOM, host down)
+def shard_status(manifest, now, stale_after=None):
+    if (manifest["status"] == "running" and stale_after is not None
+            and now - manifest["updated_at"] > stale_after):
+        return "stale"
+    return manifest["status"]
+
+
+# Merge per-shard manifests into one aggregate summary
+def merge_manifests(manifests, run_id, num_shards, stale_after=None):
+    now = time.time()
+    shards = {m["shard_index"]: m for m in manifests}
+    statuses = {index: shard_status(m, now, stale_after) for index, m in shards.items()}
+    started = [m["started_at"] for m in manifests]
+    finished = [m["finished_at"] for m in manifests if m["finished_at"] is not None]
+    complete = len(shards) == num_shards and all(status != "running" for status in statuses.values())
+    end = max(finished) if complete and finished else now
+    elapsed = end - min(started) if started else 0.0
+    pages_done = sum(m["pages_done"] for m in manifests)
+    return {
+        "run_id": run_id,
+        "num_shards": num_shards,
+        "shards_reporting": len(shards),
+        "shards_done": sum(1 for status in statuses.values() if status == "done"),
+        "shards_failed": sorted(index for index, status in statuses.items() if status == "failed"),
+        "shards_stale": sorted(index for index, status in statuses.items() if status == "stale"),
+        "shards_missing": sorted(set(range(num_shards)) - set(shards)),
+        "hosts": sorted({m["host"] for m in manifests}),
+        "complete": complete,
+        "pdfs_total": sum(m["pdfs_total"] for m in manifests),
+        "pdfs_done": sum(m["pdfs_done"] for m in manifests),
+        "pages_done": pages_done,
+        "pages_fed": sum(m["pages_fed"] for m in manifests),
+        "feed_errors": sum(m["feed_errors"] for m in manifests),
+        "elapsed_seconds": round(elapsed, 2),
+        "pages_per_second": round(pages_done / elapsed, 3) if elapsed > 0 else 0.0,
+        "pdfs": [pdf for index in sorted(shards) for pdf in shards[index]["pdfs"]],
+        "pdfs_failed": [pdf for index in sorted(shards) for pdf in shards[index]["pdfs_failed"]],
+    }